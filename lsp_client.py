@@ -1,25 +1,95 @@
+import concurrent.futures
+import itertools
 import json
 import os
+import selectors
 import subprocess
 import threading
 import logging
 import time
 
+try:
+    import orjson
+
+    def _dumps(message):
+        return orjson.dumps(message)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(message):
+        return json.dumps(message).encode('utf-8')
+
+    def _loads(content):
+        return json.loads(str(content, 'utf-8'))
+
+_CONTENT_LENGTH = b"Content-Length:"
+_HEADER_PREFIX = _CONTENT_LENGTH + b" "
+_HEADER_SUFFIX = b"\r\n\r\n"
+
+# Every notification starts with the same envelope, so it is assembled from
+# these pre-encoded fragments instead of serializing a wrapper dict
+_NOTIFICATION_PREFIX = b'{"jsonrpc":"2.0","method":'
+_NOTIFICATION_PARAMS = b',"params":'
+
+# Bytes requested per read() from the server's pipes
+_READ_SIZE = 65536
+
+# How long publishDiagnostics notifications are coalesced before dispatch
+_DIAGNOSTICS_DELAY = 0.02
+
+# Client capabilities sent with every initialize request
+_INIT_CAPS = {
+    "textDocument": {
+        "completion": {
+            "completionItem": {
+                "snippetSupport": False
+            }
+        },
+        "hover": {
+            "contentFormat": ["markdown", "plaintext"]
+        },
+        "publishDiagnostics": {
+            "relatedInformation": True,
+            "tagSupport": {"valueSet": [1, 2]},
+            "versionSupport": True
+        },
+        "synchronization": {
+            "dynamicRegistration": False,
+            "willSave": False,
+            "didSave": False,
+            "didSaveWaitUntil": False
+        }
+    }
+}
+
+
 class LSPClient:
     def __init__(self, executable_path, args=None, log=None, env=None):
         self.executable_path = executable_path
         self.args = args or []
         self.process = None
+        # Bytes read from each pipe that do not yet form a whole message/line
+        self._stdout_buf = bytearray()
+        self._stderr_buf = bytearray()
+        self._wake_r = None
+        self._wake_w = None
         self.log = log or logging.getLogger(__name__)
         self.env = env
-        self.lock = threading.Lock()
-        self.request_id = 0
-        self.responses = {}
-        self.response_events = {}
+        # Serializes frames written to the server's stdin
+        self._write_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        # In-flight request id -> Future resolved with the response message.
+        # Only single-key insert/pop are used, which are atomic under the
+        # GIL, so whichever of the reader and a timed-out sender pops an
+        # entry first owns it
+        self.pending_requests = {}
         self.running = False
         self.reader_thread = None
-        self.stderr_thread = None
         self.diagnostics_callback = None  # Callback for diagnostics notifications
+        # Latest publishDiagnostics params per URI, waiting for the timer
+        self._diag_lock = threading.Lock()
+        self._diag_pending = {}
+        self._diag_timer = None
 
     def start(self):
         """Start the LSP server process."""
@@ -33,18 +103,16 @@ class LSPClient:
                 env=self.env,
                 bufsize=0  # Unbuffered
             )
+            # stop() writes to this pipe to wake the reader out of select(),
+            # and closes it once the reader has exited
+            self._wake_r, self._wake_w = os.pipe()
             self.running = True
             
-            # Start stdout reader
+            # One thread drains both stdout and stderr
             self.reader_thread = threading.Thread(target=self._read_loop)
             self.reader_thread.daemon = True
             self.reader_thread.start()
             
-            # Start stderr reader
-            self.stderr_thread = threading.Thread(target=self._stderr_loop)
-            self.stderr_thread.daemon = True
-            self.stderr_thread.start()
-            
             self.log.info(f"Started LSP server: {self.executable_path}")
         except Exception as e:
             self.log.error(f"Failed to start LSP server: {e}")
@@ -53,95 +121,187 @@ class LSPClient:
     def stop(self):
         """Stop the LSP server process."""
         self.running = False
+        with self._diag_lock:
+            if self._diag_timer is not None:
+                self._diag_timer.cancel()
+                self._diag_timer = None
+            self._diag_pending.clear()
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'x')
+            except OSError:
+                pass
         if self.process:
             try:
-                self.process.terminate()
-                self.process.wait(timeout=2)
+                # Many servers exit on their own at stdin EOF; only signal
+                # the ones that are still running after a short grace period
+                self.process.stdin.close()
+                if not self._wait_for_exit():
+                    self.process.terminate()
+                    if not self._wait_for_exit():
+                        self._kill()
             except Exception as e:
                 self.log.error(f"Error stopping LSP server: {e}")
                 if self.process:
-                    self.process.kill()
+                    self._kill()
+        self._close_wake_pipe()
 
-    def _read_loop(self):
-        """Read messages from the LSP server stdout."""
-        while self.running and self.process:
-            try:
-                # Read Content-Length header
-                header = self._read_header()
-                if not header:
-                    break
-                
-                content_length = int(header.get('Content-Length', 0))
-                if content_length == 0:
-                    continue
-
-                # Read content
-                content = self.process.stdout.read(content_length)
-                if not content:
-                    break
-
-                message = json.loads(content.decode('utf-8'))
-                self._handle_message(message)
+    def _kill(self):
+        """Kill the server and reap it, so no zombie is left behind."""
+        self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.log.error("LSP server did not exit after SIGKILL")
 
-            except Exception as e:
-                self.log.error(f"Error in LSP read loop: {e}")
-                break
+    def _close_wake_pipe(self):
+        """Close the wake-up pipe once the reader thread is done with it."""
+        reader = self.reader_thread
+        if reader is threading.current_thread():
+            return
+        if reader is not None:
+            reader.join(timeout=1)
+            if reader.is_alive():
+                # Closing now could hand its fd numbers to another file
+                # while the reader still selects on them; leak them instead
+                self.log.error("LSP reader thread did not exit")
+                return
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._wake_r = self._wake_w = None
 
-    def _stderr_loop(self):
-        """Read messages from the LSP server stderr."""
-        while self.running and self.process:
-            try:
-                line = self.process.stderr.readline()
-                if not line:
-                    break
-                self.log.warning(f"LSP Stderr: {line.decode('utf-8', errors='replace').strip()}")
-            except Exception as e:
-                self.log.error(f"Error in LSP stderr loop: {e}")
-                break
+    def _wait_for_exit(self, attempts=20):
+        """Poll for the server to exit for up to attempts * 10ms."""
+        for _ in range(attempts):
+            if self.process.poll() is not None:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _read_loop(self):
+        """Read messages from the LSP server stdout and log its stderr.
+
+        Both pipes and the wake-up pipe are multiplexed with a selector, so
+        stop() takes effect immediately instead of after the next read.
+        """
+        selector = selectors.DefaultSelector()
+        selector.register(self.process.stdout, selectors.EVENT_READ, self._feed_stdout)
+        selector.register(self.process.stderr, selectors.EVENT_READ, self._feed_stderr)
+        selector.register(self._wake_r, selectors.EVENT_READ, None)
+        open_pipes = 2
+        try:
+            while self.running and open_pipes:
+                for key, _ in selector.select():
+                    if key.data is None:
+                        return
+                    data = os.read(key.fd, _READ_SIZE)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        open_pipes -= 1
+                        continue
+                    key.data(data)
+        except Exception as e:
+            self.log.error(f"Error in LSP read loop: {e}")
+        finally:
+            selector.close()
 
-    def _read_header(self):
-        """Read HTTP-style headers from stdout."""
-        headers = {}
+    def _feed_stdout(self, data):
+        """Buffer stdout data and dispatch every complete message in it."""
+        buf = self._stdout_buf
+        buf += data
+        start = 0
         while True:
-            line = self.process.stdout.readline()
-            if not line:
-                return None
-            line = line.decode('utf-8').strip()
-            if not line:
+            header_end = buf.find(_HEADER_SUFFIX, start)
+            if header_end < 0:
+                break
+            # Only Content-Length matters; other headers (only Content-Type
+            # in practice) are skipped unparsed
+            content_length = 0
+            field = buf.find(_CONTENT_LENGTH, start, header_end)
+            if field >= 0:
+                value_end = buf.find(b"\r\n", field, header_end)
+                if value_end < 0:
+                    value_end = header_end
+                # int() strips the surrounding whitespace itself
+                content_length = int(buf[field + len(_CONTENT_LENGTH):value_end])
+            body_start = header_end + len(_HEADER_SUFFIX)
+            body_end = body_start + content_length
+            if body_end > len(buf):
                 break
-            parts = line.split(':', 1)
-            if len(parts) == 2:
-                headers[parts[0].strip()] = parts[1].strip()
-        return headers
+            if content_length:
+                # Decode straight from the buffer instead of copying the body
+                with memoryview(buf) as view, view[body_start:body_end] as body:
+                    message = _loads(body)
+                self._handle_message(message)
+            start = body_end
+        if start:
+            del buf[:start]
+
+    def _feed_stderr(self, data):
+        """Log each complete line the LSP server writes to stderr."""
+        buf = self._stderr_buf
+        buf += data
+        end = buf.rfind(b"\n")
+        if end < 0:
+            return
+        # Skip the decode when warnings are filtered out
+        if self.log.isEnabledFor(logging.WARNING):
+            for line in buf[:end].split(b"\n"):
+                self.log.warning("LSP Stderr: %s", line.decode('utf-8', errors='replace').strip())
+        del buf[:end + 1]
 
     def _handle_message(self, message):
         """Handle an incoming JSON-RPC message."""
         if 'id' in message:
             request_id = message['id']
-            with self.lock:
-                if request_id in self.response_events:
-                    self.responses[request_id] = message
-                    self.response_events[request_id].set()
+            future = self.pending_requests.pop(request_id, None)
+            if future is not None:
+                future.set_result(message)
         else:
             # Notification or log message
             method = message.get('method', '')
             if method == 'window/logMessage':
-                self.log.debug(f"LSP Log: {message.get('params', {})}")
+                self.log.debug("LSP Log: %s", message.get('params', {}))
             elif method == 'textDocument/publishDiagnostics':
                 # Handle diagnostics notification
                 if self.diagnostics_callback:
-                    try:
-                        self.diagnostics_callback(message.get('params', {}))
-                    except Exception as e:
-                        self.log.error(f"Error in diagnostics callback: {e}")
+                    self._queue_diagnostics(message.get('params', {}))
+
+    def _queue_diagnostics(self, params):
+        """Coalesce diagnostics by URI and dispatch them after a short delay.
+
+        Servers publish diagnostics in bursts; only the latest params per
+        URI are delivered, and the callback runs off the reader thread.
+        """
+        with self._diag_lock:
+            self._diag_pending[params.get('uri')] = params
+            if self._diag_timer is None:
+                self._diag_timer = threading.Timer(_DIAGNOSTICS_DELAY, self._flush_diagnostics)
+                self._diag_timer.daemon = True
+                self._diag_timer.start()
+
+    def _flush_diagnostics(self):
+        """Deliver the coalesced diagnostics to the callback."""
+        with self._diag_lock:
+            pending = self._diag_pending
+            self._diag_pending = {}
+            self._diag_timer = None
+        callback = self.diagnostics_callback
+        if not callback:
+            return
+        for params in pending.values():
+            try:
+                callback(params)
+            except Exception as e:
+                self.log.error(f"Error in diagnostics callback: {e}")
 
     def send_request(self, method, params, timeout=15.0):
         """Send a JSON-RPC request and wait for the response."""
-        with self.lock:
-            self.request_id += 1
-            request_id = self.request_id
-            event = threading.Event()
-            self.response_events[request_id] = event
+        # next() on itertools.count is atomic under the GIL
+        request_id = next(self._request_ids)
+        future = concurrent.futures.Future()
+        self.pending_requests[request_id] = future
 
         request = {
             "jsonrpc": "2.0",
@@ -152,36 +312,41 @@ class LSPClient:
 
         self._send_message(request)
 
-        if event.wait(timeout):
-            with self.lock:
-                response = self.responses.pop(request_id)
-                del self.response_events[request_id]
-            
-            if 'error' in response:
-                raise Exception(f"LSP Error: {response['error']}")
-            return response.get('result')
-        else:
-            with self.lock:
-                del self.response_events[request_id]
-            raise TimeoutError(f"LSP request {method} timed out after {timeout}s")
+        try:
+            response = future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # If the reader popped the entry first, its response is on the way
+            if self.pending_requests.pop(request_id, None) is not None:
+                raise TimeoutError(f"LSP request {method} timed out after {timeout}s")
+            response = future.result()
+
+        if 'error' in response:
+            raise Exception(f"LSP Error: {response['error']}")
+        return response.get('result')
 
     def send_notification(self, method, params):
         """Send a JSON-RPC notification (no response expected)."""
-        notification = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "params": params
-        }
-        self._send_message(notification)
+        content = bytearray(_NOTIFICATION_PREFIX)
+        content += _dumps(method)
+        content += _NOTIFICATION_PARAMS
+        content += _dumps(params)
+        content += b'}'
+        self._send_content(content)
 
     def _send_message(self, message):
         """Send a raw JSON message with headers."""
-        content = json.dumps(message).encode('utf-8')
-        header = f"Content-Length: {len(content)}\r\n\r\n".encode('utf-8')
+        self._send_content(_dumps(message))
+
+    def _send_content(self, content):
+        """Send an already-serialized JSON message with headers."""
+        # stdin is unbuffered, so write the frame in one call (one syscall)
+        frame = bytearray(_HEADER_PREFIX)
+        frame += str(len(content)).encode('ascii')
+        frame += _HEADER_SUFFIX
+        frame += content
         try:
-            with self.lock:
-                self.process.stdin.write(header)
-                self.process.stdin.write(content)
+            with self._write_lock:
+                self.process.stdin.write(frame)
                 self.process.stdin.flush()
         except Exception as e:
             self.log.error(f"Failed to send message: {e}")
@@ -192,29 +357,7 @@ class LSPClient:
         params = {
             "processId": os.getpid(),
             "rootUri": f"file://{root_path}",
-            "capabilities": {
-                "textDocument": {
-                    "completion": {
-                        "completionItem": {
-                            "snippetSupport": False
-                        }
-                    },
-                    "hover": {
-                        "contentFormat": ["markdown", "plaintext"]
-                    },
-                    "publishDiagnostics": {
-                        "relatedInformation": True,
-                        "tagSupport": {"valueSet": [1, 2]},
-                        "versionSupport": True
-                    },
-                    "synchronization": {
-                        "dynamicRegistration": False,
-                        "willSave": False,
-                        "didSave": False,
-                        "didSaveWaitUntil": False
-                    }
-                }
-            }
+            "capabilities": _INIT_CAPS
         }
         result = self.send_request("initialize", params)
         self.send_notification("initialized", {})
@@ -15,17 +15,67 @@
 # limitations under the License.
 
 import argparse
+import concurrent.futures
+import functools
+import hashlib
 import json
 import os
 import platform
+import stat
 import sys
 
-from jupyter_client.kernelspec import KernelSpecManager
-from IPython.utils.tempdir import TemporaryDirectory
-from glob import glob
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 kernel_code_name_allowed_chars = "-."
 
+# Deletes every ASCII character that is neither alphanumeric nor allowed
+_kernel_code_name_deletions = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128)) if not (c.isalnum() or c in kernel_code_name_allowed_chars)))
+
+# platform.system() runs uname; the answer cannot change within a run
+_SYSTEM = platform.system()
+_IS_LINUX = _SYSTEM == 'Linux'
+_IS_DARWIN = _SYSTEM == 'Darwin'
+_IS_WINDOWS = _SYSTEM == 'Windows'
+
+# apt.llvm.org versions whose python3-lldb packages may provide LLDB (and
+# repl_swift) for Swiftly toolchains
+LLVM_VERSIONS = (13, 14, 15, 16, 17, 18)
+
+# Resolved kernel environments from earlier runs, keyed by the toolchain and
+# the arguments that shape the environment
+_ENV_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                              'swift-jupyter')
+# Bump when the cached entry format or the discovery in make_kernel_env
+# changes, so entries written by older versions miss
+_ENV_CACHE_VERSION = 2
+
+
+@functools.lru_cache(maxsize=512)
+def _cached_stat(path):
+    """os.stat() memoized for the lifetime of the process; None if missing.
+
+    The toolchain and LLDB candidate directories are probed several times
+    while building and validating the kernel environment.
+    """
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _isdir(path):
+    st = _cached_stat(path)
+    return st is not None and stat.S_ISDIR(st.st_mode)
+
+
+def _isfile(path):
+    st = _cached_stat(path)
+    return st is not None and stat.S_ISREG(st.st_mode)
+
 
 def get_kernel_code_name(kernel_name):
     """
@@ -34,10 +84,121 @@ def get_kernel_code_name(kernel_name):
     """
 
     kernel_code_name = kernel_name.lower().replace(" ", kernel_code_name_allowed_chars[0])
+    if kernel_code_name.isascii():
+        return kernel_code_name.translate(_kernel_code_name_deletions)
+    # Non-ASCII names need the Unicode-aware isalnum() check per character
     kernel_code_name = "".join(list(filter(lambda x: x.isalnum() or x in kernel_code_name_allowed_chars, kernel_code_name)))
     return kernel_code_name
 
 
+def _split_siblings(paths):
+    """Splits paths into {parent: [children]} for those sharing a parent
+    directory with another path, and a list of the remaining single paths."""
+    by_parent = {}
+    singles = []
+    for path in paths:
+        parent, name = os.path.split(path)
+        if name:
+            by_parent.setdefault(parent, []).append(path)
+        else:
+            singles.append(path)
+    for parent in [parent for parent, children in by_parent.items() if len(children) == 1]:
+        singles.append(by_parent.pop(parent)[0])
+    return by_parent, singles
+
+
+def _existing_dirs(paths):
+    """Returns the set of paths that are directories.
+
+    Siblings share one os.scandir() of their parent instead of a stat each;
+    single paths fall back to the memoized _isdir.
+    """
+    by_parent, singles = _split_siblings(paths)
+    existing = {path for path in singles if _isdir(path)}
+    for parent, children in by_parent.items():
+        try:
+            with os.scandir(parent or '.') as entries:
+                names = {entry.name for entry in entries if entry.is_dir()}
+        except OSError:
+            continue
+        existing.update(child for child in children if os.path.basename(child) in names)
+    return existing
+
+
+def _prefetch_stats(paths):
+    """Warms the stat cache for independent paths concurrently.
+
+    stat() releases the GIL, so on slow mounts (NFS, sshfs, Docker volumes
+    on macOS) the round-trips overlap instead of adding up.
+    """
+    paths = [path for path in dict.fromkeys(paths) if path]
+    if len(paths) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(_cached_stat, paths))
+
+
+def _list_lldb_artifacts(lldb_dir):
+    """Reads the lldb package directory once and reports what it contains.
+
+    Returns None if lldb_dir cannot be listed, otherwise a dict with
+    '_lldb.so' and '__init__.py' (bools), 'cpython_so' (path of a
+    _lldb.cpython-*.so or None) and 'repl_swift' (path or None).
+    """
+    artifacts = {'_lldb.so': False, 'cpython_so': None, '__init__.py': False, 'repl_swift': None}
+    try:
+        with os.scandir(lldb_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if name == '_lldb.so':
+                    artifacts['_lldb.so'] = entry.is_file()
+                elif name.startswith('_lldb.cpython-') and name.endswith('.so'):
+                    if entry.is_file():
+                        artifacts['cpython_so'] = entry.path
+                elif name == '__init__.py':
+                    artifacts['__init__.py'] = entry.is_file()
+                elif name == 'repl_swift':
+                    if entry.is_file():
+                        artifacts['repl_swift'] = entry.path
+    except OSError:
+        return None
+    return artifacts
+
+
+def _resolve_first_existing(paths):
+    """Returns the first path in paths that is an existing file, or None.
+
+    Duplicates are dropped (keeping the first occurrence) before probing.
+    """
+    for path in dict.fromkeys(paths):
+        if _isfile(path):
+            return path
+    return None
+
+
+def _system_lldb_layouts(pyver):
+    """Yields (pythonpath, repl_swift) pairs for apt-installed LLVM LLDBs."""
+    for llvm in LLVM_VERSIONS:
+        pythonpath = '/usr/lib/llvm-%d/lib/python%s/dist-packages' % (llvm, pyver)
+        yield pythonpath, pythonpath + '/lldb/repl_swift'
+
+
+def _find_libpython(libdir, prefix, suffix):
+    """Returns the first file in libdir named prefix*suffix, or None.
+
+    Stops at the first match instead of listing and fnmatch-ing the whole
+    directory like glob(), which matters for large conda lib directories.
+    """
+    try:
+        with os.scandir(libdir) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith(prefix) and name.endswith(suffix):
+                    return os.path.join(libdir, name)
+    except OSError:
+        pass
+    return None
+
+
 def linux_pythonpath(root):
     """Find LLDB Python bindings path for Linux.
 
@@ -46,49 +207,38 @@ def linux_pythonpath(root):
     2. Generic python3/dist-packages
     3. System-installed lldb (for Swiftly installations)
     """
-    # Try version-specific site-packages first
-    version_specific = '%s/lib/python%d.%d/site-packages' % (root,
-                                                              sys.version_info[0],
-                                                              sys.version_info[1])
-    if os.path.isdir(version_specific) and os.path.isdir(os.path.join(version_specific, 'lldb')):
-        return version_specific
-
-    # Try generic python3 dist-packages
-    generic_dist = '%s/lib/python%s/dist-packages' % (root, sys.version_info[0])
-    if os.path.isdir(generic_dist) and os.path.isdir(os.path.join(generic_dist, 'lldb')):
-        return generic_dist
-
-    # Try local/lib (common in some toolchain builds)
-    local_dist = '%s/local/lib/python%d.%d/dist-packages' % (root,
-                                                              sys.version_info[0],
-                                                              sys.version_info[1])
-    if os.path.isdir(local_dist) and os.path.isdir(os.path.join(local_dist, 'lldb')):
-        return local_dist
+    pyver = '%d.%d' % (sys.version_info[0], sys.version_info[1])
+    generic_dist = '%s/lib/python%d/dist-packages' % (root, sys.version_info[0])
+
+    # Try the toolchain first: version-specific site-packages, generic
+    # python3 dist-packages, then local/lib (common in some toolchain builds).
+    # An existing lldb subdirectory implies its parent exists, so each
+    # candidate costs a single stat.
+    toolchain_lldb_paths = (
+        '%s/lib/python%s/site-packages' % (root, pyver),
+        generic_dist,
+        '%s/local/lib/python%s/dist-packages' % (root, pyver),
+    )
+    for toolchain_path in toolchain_lldb_paths:
+        if _isdir(os.path.join(toolchain_path, 'lldb')):
+            return toolchain_path
 
     # For Swiftly toolchains, check if lldb is installed system-wide
     # This happens when using python3-lldb package
-    system_lldb_paths = [
-        '/usr/lib/python3/dist-packages',
-        '/usr/lib/python%d.%d/dist-packages' % (sys.version_info[0], sys.version_info[1]),
-        '/usr/lib/llvm-13/lib/python%d.%d/dist-packages' % (sys.version_info[0], sys.version_info[1]),
-        '/usr/lib/llvm-14/lib/python%d.%d/dist-packages' % (sys.version_info[0], sys.version_info[1]),
-        '/usr/lib/llvm-15/lib/python%d.%d/dist-packages' % (sys.version_info[0], sys.version_info[1]),
-        '/usr/lib/llvm-16/lib/python%d.%d/dist-packages' % (sys.version_info[0], sys.version_info[1]),
-        '/usr/lib/llvm-17/lib/python%d.%d/dist-packages' % (sys.version_info[0], sys.version_info[1]),
-        '/usr/lib/llvm-18/lib/python%d.%d/dist-packages' % (sys.version_info[0], sys.version_info[1]),
-    ]
+    system_lldb_paths = ['/usr/lib/python3/dist-packages',
+                         '/usr/lib/python%s/dist-packages' % pyver]
+    system_lldb_paths += [pythonpath for pythonpath, _ in _system_lldb_layouts(pyver)]
+    system_lldb_paths = list(dict.fromkeys(system_lldb_paths))
 
     print(f'  🔍 Toolchain LLDB not found, searching system locations...')
-    print(f'     Python version: {sys.version_info[0]}.{sys.version_info[1]}')
+    print(f'     Python version: {pyver}')
 
     for sys_path in system_lldb_paths:
-        lldb_path = os.path.join(sys_path, 'lldb')
-        if os.path.isdir(sys_path):
-            if os.path.isdir(lldb_path):
-                print(f'  ✅ Found system LLDB Python bindings at {sys_path}')
-                return sys_path
-            else:
-                print(f'  ⚠️  Directory exists but no lldb: {sys_path}')
+        if _isdir(os.path.join(sys_path, 'lldb')):
+            print(f'  ✅ Found system LLDB Python bindings at {sys_path}')
+            return sys_path
+        if _isdir(sys_path):
+            print(f'  ⚠️  Directory exists but no lldb: {sys_path}')
 
     # Fallback to generic dist-packages (let validation catch if it doesn't exist)
     print(f'  ❌ No system LLDB found in any location')
@@ -103,10 +253,12 @@ def make_kernel_env(args):
 
     if args.swift_toolchain is not None:
         # Use a prebuilt Swift toolchain.
-        if platform.system() == 'Linux':
+        tc = args.swift_toolchain
+        if _IS_LINUX:
+            usr = tc + '/usr'
             # Find LLDB Python bindings (might be in toolchain or system-wide)
-            kernel_env['PYTHONPATH'] = linux_pythonpath(args.swift_toolchain + '/usr')
-            kernel_env['SWIFT_TOOLCHAIN_ROOT'] = args.swift_toolchain
+            kernel_env['PYTHONPATH'] = linux_pythonpath(usr)
+            kernel_env['SWIFT_TOOLCHAIN_ROOT'] = tc
 
             # kernel_env['LD_LIBRARY_PATH'] = '%s/usr/lib/swift/linux' % args.swift_toolchain
             
@@ -120,68 +272,63 @@ def make_kernel_env(args):
             # 2. In toolchain libexec
             # 3. System-wide (for Swiftly with system LLDB)
             repl_swift_candidates = [
-                '%s/usr/bin/repl_swift' % args.swift_toolchain,
-                '%s/usr/libexec/swift/linux/repl_swift' % args.swift_toolchain,
-                '%s/libexec/swift/linux/repl_swift' % args.swift_toolchain,
+                f'{usr}/bin/repl_swift',
+                f'{usr}/libexec/swift/linux/repl_swift',
+                f'{tc}/libexec/swift/linux/repl_swift',
             ]
 
-            repl_swift_path = None
-            for candidate in repl_swift_candidates:
-                if os.path.isfile(candidate):
-                    repl_swift_path = candidate
-                    break
+            repl_swift_path = _resolve_first_existing(repl_swift_candidates)
 
             # If not found in toolchain, will try system locations in validation
-            kernel_env['REPL_SWIFT_PATH'] = repl_swift_path if repl_swift_path else '%s/usr/bin/repl_swift' % args.swift_toolchain
+            kernel_env['REPL_SWIFT_PATH'] = repl_swift_path if repl_swift_path else f'{usr}/bin/repl_swift'
 
-            kernel_env['SWIFT_BUILD_PATH'] = '%s/usr/bin/swift-build' % args.swift_toolchain
-            kernel_env['SWIFT_PACKAGE_PATH'] = '%s/usr/bin/swift-package' % args.swift_toolchain
-        elif platform.system() == 'Darwin':
+            kernel_env['SWIFT_BUILD_PATH'] = f'{usr}/bin/swift-build'
+            kernel_env['SWIFT_PACKAGE_PATH'] = f'{usr}/bin/swift-package'
+        elif _IS_DARWIN:
             # Try the standard location first (under /usr)
-            pythonpath_standard = '%s/System/Library/PrivateFrameworks/LLDB.framework/Resources/Python' % args.swift_toolchain
+            pf_standard = tc + '/System/Library/PrivateFrameworks'
+            pythonpath_standard = pf_standard + '/LLDB.framework/Resources/Python'
             # For dev snapshots, LLDB.framework is at the toolchain root
-            toolchain_root = os.path.dirname(args.swift_toolchain) if args.swift_toolchain.endswith('/usr') else args.swift_toolchain
-            pythonpath_dev = '%s/System/Library/PrivateFrameworks/LLDB.framework/Resources/Python' % toolchain_root
+            toolchain_root = os.path.dirname(tc) if tc.endswith('/usr') else tc
+            pf_dev = toolchain_root + '/System/Library/PrivateFrameworks'
+            pythonpath_dev = pf_dev + '/LLDB.framework/Resources/Python'
             
             # Check which one exists
-            if os.path.isdir(pythonpath_standard + '/lldb'):
-                kernel_env['PYTHONPATH'] = pythonpath_standard
-                kernel_env['REPL_SWIFT_PATH'] = '%s/System/Library/PrivateFrameworks/LLDB.framework/Resources/repl_swift' % args.swift_toolchain
-                lldb_framework_path = '%s/System/Library/PrivateFrameworks' % args.swift_toolchain
-            elif os.path.isdir(pythonpath_dev + '/lldb'):
-                kernel_env['PYTHONPATH'] = pythonpath_dev
-                kernel_env['REPL_SWIFT_PATH'] = '%s/System/Library/PrivateFrameworks/LLDB.framework/Resources/repl_swift' % toolchain_root
-                lldb_framework_path = '%s/System/Library/PrivateFrameworks' % toolchain_root
+            if _isdir(pythonpath_standard + '/lldb'):
+                lldb_framework_path = pf_standard
+            elif _isdir(pythonpath_dev + '/lldb'):
+                lldb_framework_path = pf_dev
             else:
                 # Fallback to standard path and let validation catch it
-                kernel_env['PYTHONPATH'] = pythonpath_standard
-                kernel_env['REPL_SWIFT_PATH'] = '%s/System/Library/PrivateFrameworks/LLDB.framework/Resources/repl_swift' % args.swift_toolchain
-                lldb_framework_path = '%s/System/Library/PrivateFrameworks' % args.swift_toolchain
+                lldb_framework_path = pf_standard
+            kernel_env['PYTHONPATH'] = f'{lldb_framework_path}/LLDB.framework/Resources/Python'
+            kernel_env['REPL_SWIFT_PATH'] = f'{lldb_framework_path}/LLDB.framework/Resources/repl_swift'
             
             # Set DYLD_FRAMEWORK_PATH so _lldb can find the LLDB framework
             kernel_env['DYLD_FRAMEWORK_PATH'] = lldb_framework_path
 
             # Always use toolchain_root for LD_LIBRARY_PATH to avoid double /usr/usr
-            kernel_env['LD_LIBRARY_PATH'] = '%s/usr/lib/swift/macosx' % toolchain_root
+            usr = toolchain_root + '/usr'
+            kernel_env['LD_LIBRARY_PATH'] = f'{usr}/lib/swift/macosx'
 
             # Set SWIFT_BUILD_PATH for %install directive support
-            kernel_env['SWIFT_BUILD_PATH'] = '%s/usr/bin/swift-build' % toolchain_root
-            kernel_env['SWIFT_PACKAGE_PATH'] = '%s/usr/bin/swift-package' % toolchain_root
-        elif platform.system() == 'Windows':
-            kernel_env['PYTHONPATH'] = os.path.join('%s','usr','lib','site-packages') % args.swift_toolchain
-            kernel_env['LD_LIBRARY_PATH'] = os.path.join(os.path.dirname(os.path.dirname(args.swift_toolchain)),
+            kernel_env['SWIFT_BUILD_PATH'] = f'{usr}/bin/swift-build'
+            kernel_env['SWIFT_PACKAGE_PATH'] = f'{usr}/bin/swift-package'
+        elif _IS_WINDOWS:
+            kernel_env['PYTHONPATH'] = os.path.join(tc, 'usr', 'lib', 'site-packages')
+            kernel_env['LD_LIBRARY_PATH'] = os.path.join(os.path.dirname(os.path.dirname(tc)),
                                                         'Platforms','Windows.platform','Developer','Library','XCTest-development',
                                                         'usr','lib','swift')
-            kernel_env['REPL_SWIFT_PATH'] = os.path.join('%s','usr','bin','repl_swift.exe') % args.swift_toolchain
+            kernel_env['REPL_SWIFT_PATH'] = os.path.join(tc, 'usr', 'bin', 'repl_swift.exe')
             
         else:
-            raise Exception('Unknown system %s' % platform.system())
+            raise Exception('Unknown system %s' % _SYSTEM)
 
     elif args.swift_build is not None:
         # Use a build dir created by build-script.
 
         # TODO: Make this work on macos
-        if platform.system() != 'Linux':
+        if not _IS_LINUX:
             raise Exception('build-script build dir only implemented on Linux')
 
         swift_build_dir = '%s/swift-linux-x86_64' % args.swift_build
@@ -194,7 +341,7 @@ def make_kernel_env(args):
     elif args.xcode_path is not None:
         # Use an Xcode provided Swift toolchain.
 
-        if platform.system() != 'Darwin':
+        if not _IS_DARWIN:
             raise Exception('Xcode support is only available on Darwin')
 
         lldb_framework = '%s/Contents/SharedFrameworks/LLDB.framework' % args.xcode_path
@@ -209,26 +356,29 @@ def make_kernel_env(args):
     if args.swift_python_library is not None:
         kernel_env['PYTHON_LIBRARY'] = args.swift_python_library
     if args.swift_python_use_conda:
-        if platform.system() == 'Darwin':
-            libpython = glob(sys.prefix+'/lib/libpython*.dylib')[0]
-        elif platform.system() == 'Linux':
-            libpython = glob(sys.prefix+'/lib/libpython*.so')[0]
-        elif platform.system() == 'Windows':
-            libpython = glob(sys.prefix+'/python*.dll')[0]
+        if _IS_DARWIN:
+            libpython = _find_libpython(sys.prefix + '/lib', 'libpython', '.dylib')
+        elif _IS_LINUX:
+            libpython = _find_libpython(sys.prefix + '/lib', 'libpython', '.so')
+        elif _IS_WINDOWS:
+            libpython = _find_libpython(sys.prefix, 'python', '.dll')
         else:
-            raise Exception('Unable to find libpython for system %s' % platform.system())
+            raise Exception('Unable to find libpython for system %s' % _SYSTEM)
+        if libpython is None:
+            raise Exception('libpython not found in %s' % sys.prefix)
 
         kernel_env['PYTHON_LIBRARY'] = libpython
 
     if args.use_conda_shared_libs:
-        if platform.system() != 'Windows': # ':' is used after drive letter in Windows
-            kernel_env['LD_LIBRARY_PATH'] += ':' + sys.prefix + '/lib'
-        else:
-            kernel_env['LD_LIBRARY_PATH'] += ';' + os.path.join(sys.prefix, 'lib')
+        kernel_env['LD_LIBRARY_PATH'] += os.pathsep + os.path.join(sys.prefix, 'lib')
 
     return kernel_env
 
 
+class KernelEnvError(Exception):
+    """A kernel env var refers to something that does not exist."""
+
+
 def validate_kernel_env(kernel_env, validate_only=False):
     """Validates that the env vars refer to things that actually exist (R2-T1 enhanced).
 
@@ -240,116 +390,234 @@ def validate_kernel_env(kernel_env, validate_only=False):
         bool: True if validation passes (when validate_only=True)
 
     Raises:
-        Exception: If validation fails
+        KernelEnvError: If validation fails
     """
     # Check for LLDB Python module
     pythonpath = kernel_env['PYTHONPATH']
     lldb_dir = os.path.join(pythonpath, 'lldb')
 
+    # os.pathsep is ';' on Windows, where ':' follows the drive letter
+    lib_paths = kernel_env['LD_LIBRARY_PATH'].split(os.pathsep) if 'LD_LIBRARY_PATH' in kernel_env else []
+
+    # Stat everything checked below up front and in parallel; the checks
+    # then read the cache. Sibling library dirs are listed via their parent.
+    prefetch = [kernel_env.get(name) for name in
+                ('REPL_SWIFT_PATH', 'SWIFT_BUILD_PATH', 'SWIFT_PACKAGE_PATH', 'PYTHON_LIBRARY')]
+    if _IS_WINDOWS:
+        prefetch.append(os.path.join(lldb_dir, '_lldb.pyd'))
+    prefetch += _split_siblings(lib_paths)[1]
+    _prefetch_stats(prefetch)
+
     if validate_only:
         print('🔍 Validating LLDB installation...')
 
-    if platform.system() == 'Windows':
+    # On macOS and Linux a single listing of the lldb directory answers all
+    # the module checks below (and may turn up a repl_swift)
+    artifacts = None
+    if _IS_WINDOWS:
         lldb_module = os.path.join(pythonpath, 'lldb', '_lldb.pyd')
-        if not os.path.isfile(lldb_module):
-            raise Exception('lldb python libs not found at %s' % pythonpath)
-    elif platform.system() == 'Darwin':
+        if not _isfile(lldb_module):
+            raise KernelEnvError('lldb python libs not found at %s' % pythonpath)
+    elif _IS_DARWIN:
         # On macOS, check if lldb module directory exists and contains __init__.py
-        if not os.path.isdir(lldb_dir):
-            raise Exception('lldb python module directory not found at %s' % lldb_dir)
+        artifacts = _list_lldb_artifacts(lldb_dir)
+        if artifacts is None:
+            raise KernelEnvError('lldb python module directory not found at %s' % lldb_dir)
         # Check for __init__.py which indicates it's a valid Python module
-        if not os.path.isfile(os.path.join(lldb_dir, '__init__.py')):
-            raise Exception('lldb python module __init__.py not found at %s' % lldb_dir)
+        if not artifacts['__init__.py']:
+            raise KernelEnvError('lldb python module __init__.py not found at %s' % lldb_dir)
         if validate_only:
             print(f'  ✅ LLDB Python module found at {lldb_dir}')
     else:
         # On Linux, check if lldb module directory exists and contains _lldb.so
-        if not os.path.isdir(lldb_dir):
-            raise Exception('lldb python module directory not found at %s' % lldb_dir)
-
-        lldb_module = os.path.join(pythonpath, 'lldb', '_lldb.so')
-        if not os.path.isfile(lldb_module):
-            # For system LLDB installations, the .so might be named differently
-            lldb_module_cpython = os.path.join(pythonpath, 'lldb', '_lldb.cpython-*.so')
-            from glob import glob
-            cpython_modules = glob(lldb_module_cpython)
-            if not cpython_modules:
-                raise Exception('lldb python libs not found at %s (checked _lldb.so and _lldb.cpython-*.so)' % pythonpath)
-            else:
-                if validate_only:
-                    print(f'  ✅ LLDB Python module found at {pythonpath}')
-        else:
-            if validate_only:
-                print(f'  ✅ LLDB Python module found at {pythonpath}')
+        # (or, for system LLDB installations, _lldb.cpython-*.so)
+        artifacts = _list_lldb_artifacts(lldb_dir)
+        if artifacts is None:
+            raise KernelEnvError('lldb python module directory not found at %s' % lldb_dir)
+
+        if not artifacts['_lldb.so'] and artifacts['cpython_so'] is None:
+            raise KernelEnvError('lldb python libs not found at %s (checked _lldb.so and _lldb.cpython-*.so)' % pythonpath)
+        if validate_only:
+            print(f'  ✅ LLDB Python module found at {pythonpath}')
 
     # Check for repl_swift
-    if not os.path.isfile(kernel_env['REPL_SWIFT_PATH']):
-        # For Swiftly toolchains, try system-installed repl_swift
-        system_repl_swift_paths = [
-            '/usr/lib/llvm-13/lib/python%d.%d/dist-packages/lldb/repl_swift' % (sys.version_info[0], sys.version_info[1]),
-            '/usr/lib/llvm-14/lib/python%d.%d/dist-packages/lldb/repl_swift' % (sys.version_info[0], sys.version_info[1]),
-            '/usr/lib/llvm-15/lib/python%d.%d/dist-packages/lldb/repl_swift' % (sys.version_info[0], sys.version_info[1]),
-            '/usr/bin/repl_swift',
-        ]
-
-        repl_swift_found = False
-        for sys_repl_swift in system_repl_swift_paths:
-            if os.path.isfile(sys_repl_swift):
-                if validate_only:
-                    print(f'  ℹ️  Using system repl_swift at {sys_repl_swift}')
-                kernel_env['REPL_SWIFT_PATH'] = sys_repl_swift
-                repl_swift_found = True
-                break
-
-        if not repl_swift_found:
-            raise Exception('repl_swift binary not found at %s (also checked system locations)' %
+    if not _isfile(kernel_env['REPL_SWIFT_PATH']):
+        # For Swiftly toolchains, try system-installed repl_swift. A
+        # repl_swift shipped next to the lldb module PYTHONPATH resolved to
+        # (as in the LLVM layouts) is the one to use.
+        layouts = _system_lldb_layouts('%d.%d' % (sys.version_info[0], sys.version_info[1]))
+        system_repl_swift_paths = [artifacts['repl_swift']] if artifacts and artifacts['repl_swift'] else []
+        system_repl_swift_paths += [repl_swift for _, repl_swift in layouts]
+        system_repl_swift_paths.append('/usr/bin/repl_swift')
+
+        sys_repl_swift = _resolve_first_existing(system_repl_swift_paths)
+        if sys_repl_swift is not None:
+            if validate_only:
+                print(f'  ℹ️  Using system repl_swift at {sys_repl_swift}')
+            kernel_env['REPL_SWIFT_PATH'] = sys_repl_swift
+        else:
+            raise KernelEnvError('repl_swift binary not found at %s (also checked system locations)' %
                             kernel_env['REPL_SWIFT_PATH'])
     else:
         if validate_only:
             print(f'  ✅ repl_swift found at {kernel_env["REPL_SWIFT_PATH"]}')
 
     if 'SWIFT_BUILD_PATH' in kernel_env and \
-            not os.path.isfile(kernel_env['SWIFT_BUILD_PATH']):
-        raise Exception('swift-build binary not found at %s' %
+            not _isfile(kernel_env['SWIFT_BUILD_PATH']):
+        raise KernelEnvError('swift-build binary not found at %s' %
                         kernel_env['SWIFT_BUILD_PATH'])
     if 'SWIFT_PACKAGE_PATH' in kernel_env and \
-            not os.path.isfile(kernel_env['SWIFT_PACKAGE_PATH']):
-        raise Exception('swift-package binary not found at %s' %
+            not _isfile(kernel_env['SWIFT_PACKAGE_PATH']):
+        raise KernelEnvError('swift-package binary not found at %s' %
                         kernel_env['SWIFT_PACKAGE_PATH'])
     if 'PYTHON_LIBRARY' in kernel_env and \
-            not os.path.isfile(kernel_env['PYTHON_LIBRARY']):
-        raise Exception('python library not found at %s' %
+            not _isfile(kernel_env['PYTHON_LIBRARY']):
+        raise KernelEnvError('python library not found at %s' %
                         kernel_env['PYTHON_LIBRARY'])
     if validate_only and 'PYTHON_LIBRARY' in kernel_env:
         print(f'  ✅ Python library found at {kernel_env["PYTHON_LIBRARY"]}')
 
     if 'LD_LIBRARY_PATH' in kernel_env:
-        lib_paths = kernel_env['LD_LIBRARY_PATH'].split(':') if platform.system() != 'Windows' else \
-                                                                kernel_env['LD_LIBRARY_PATH'].split(';') # ':' proceeds after drive letter in Windows
+        existing_lib_paths = _existing_dirs(lib_paths)
         for index, lib_path in enumerate(lib_paths):
-            if os.path.isdir(lib_path):
+            if lib_path in existing_lib_paths:
                 continue
             # First LD_LIBRARY_PATH should contain the swift toolchain libs.
             if index == 0:
-                raise Exception('swift libs not found at %s' % lib_path)
+                raise KernelEnvError('swift libs not found at %s' % lib_path)
             # Other LD_LIBRARY_PATHs may be appended for other libs.
-            raise Exception('shared lib dir not found at %s' % lib_path)
+            raise KernelEnvError('shared lib dir not found at %s' % lib_path)
 
     if validate_only:
         print('✅ All validation checks passed!')
         return True
 
+def _env_cache_key(args):
+    """Returns the persistent kernel_env cache key for args, or None.
+
+    Only prebuilt toolchains are cached. The key pins the cache format and
+    this script itself (so a changed discovery logic misses) as well as the
+    toolchain directory's mtime. Files the environment resolved to are
+    checked separately, by _env_fingerprint.
+    """
+    if args.swift_toolchain is None:
+        return None
+    toolchain_st = _cached_stat(args.swift_toolchain)
+    script_st = _cached_stat(os.path.abspath(__file__))
+    if toolchain_st is None or script_st is None:
+        return None
+    return [_ENV_CACHE_VERSION, script_st.st_mtime_ns, script_st.st_size,
+            args.swift_toolchain, toolchain_st.st_mtime_ns,
+            list(sys.version_info[:2]), sys.prefix, _SYSTEM,
+            args.swift_python_version, args.swift_python_library,
+            args.swift_python_use_conda, args.use_conda_shared_libs]
+
+
+def _env_fingerprint(env):
+    """Returns [path, mtime_ns, size] for each file env resolved to, or None.
+
+    Covers the lldb package's __init__.py and native module, repl_swift and
+    the other binaries and libraries env names, wherever they live (system
+    LLVM LLDBs are outside the toolchain). None if any of them is missing.
+    """
+    lldb_dir = os.path.join(env['PYTHONPATH'], 'lldb')
+    paths = [os.path.join(lldb_dir, '__init__.py')]
+    if _IS_WINDOWS:
+        paths.append(os.path.join(lldb_dir, '_lldb.pyd'))
+    else:
+        artifacts = _list_lldb_artifacts(lldb_dir)
+        if artifacts is None:
+            return None
+        if artifacts['_lldb.so']:
+            paths.append(os.path.join(lldb_dir, '_lldb.so'))
+        elif artifacts['cpython_so'] is not None:
+            paths.append(artifacts['cpython_so'])
+        elif not _IS_DARWIN:
+            return None
+    paths += [env[name] for name in
+              ('REPL_SWIFT_PATH', 'SWIFT_BUILD_PATH', 'SWIFT_PACKAGE_PATH', 'PYTHON_LIBRARY')
+              if name in env]
+    fingerprint = []
+    for path in paths:
+        st = _cached_stat(path)
+        if st is None:
+            return None
+        fingerprint.append([path, st.st_mtime_ns, st.st_size])
+    return fingerprint
+
+
+def _env_cache_path(key):
+    digest = hashlib.blake2b(json.dumps(key).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(_ENV_CACHE_DIR, 'env-%s.json' % digest)
+
+
+def _load_cached_env(key):
+    """Returns the validated kernel_env stored for key, or None on a miss.
+
+    An entry also misses when any file it resolved to is gone or changed.
+    """
+    try:
+        with open(_env_cache_path(key)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('key') != key:
+        return None
+    env = cached.get('env')
+    if not isinstance(env, dict) or 'PYTHONPATH' not in env:
+        return None
+    fingerprint = _env_fingerprint(env)
+    if fingerprint is None or fingerprint != cached.get('files'):
+        return None
+    return env
+
+
+def _store_cached_env(key, env):
+    """Stores env for key; failures only cost the next run a cache miss."""
+    fingerprint = _env_fingerprint(env)
+    if fingerprint is None:
+        return
+    path = _env_cache_path(key)
+    try:
+        os.makedirs(_ENV_CACHE_DIR, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'key': key, 'env': env, 'files': fingerprint}, f)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass
+
+
 def main():
     args = parse_args()
-    kernel_env = make_kernel_env(args)
 
-    # Validate environment (R2-T1)
+    env_cache_key = _env_cache_key(args)
+    cached_env = _load_cached_env(env_cache_key) if env_cache_key is not None else None
+
+    # Validate environment (R2-T1). The cache only saves the discovery in
+    # make_kernel_env; validation always runs, since it is cheap next to a
+    # kernel start. A cached env is checked quietly first and rediscovered
+    # if it no longer validates, so --validate-only reports once, on the
+    # env actually used (the second pass reads memoized stats).
+    if cached_env is not None:
+        kernel_env = dict(cached_env)
+        try:
+            validate_kernel_env(kernel_env)
+        except KernelEnvError:
+            cached_env = None
+    if cached_env is None:
+        kernel_env = make_kernel_env(args)
+    validate_kernel_env(kernel_env, validate_only=args.validate_only)
+    if env_cache_key is not None and kernel_env != cached_env:
+        _store_cached_env(env_cache_key, kernel_env)
+
     if args.validate_only:
-        validate_kernel_env(kernel_env, validate_only=True)
         print('\n✅ Validation complete - environment is ready for kernel registration')
         return
-    else:
-        validate_kernel_env(kernel_env, validate_only=False)
+
+    # Imported here so that --validate-only does not pay for the
+    # jupyter_client/IPython import chains
+    from jupyter_client.kernelspec import KernelSpecManager
+    from IPython.utils.tempdir import TemporaryDirectory
 
     script_dir = os.path.dirname(os.path.realpath(sys.argv[0]))
 
@@ -370,14 +638,25 @@ def main():
         'env': kernel_env,
     }
 
-    print('kernel.json:\n%s\n' % json.dumps(kernel_json, indent=2))
+    # Serialize once, compactly, and write it with a single write(); only
+    # --verbose pays for an indented copy for the console
+    if orjson is not None:
+        data = orjson.dumps(kernel_json)
+    else:
+        data = json.dumps(kernel_json).encode('utf-8')
+
+    if args.verbose:
+        print('kernel.json:\n%s\n' % json.dumps(kernel_json, indent=2))
 
     kernel_code_name = get_kernel_code_name(args.kernel_name)
+    if not kernel_code_name:
+        raise Exception('kernel name %r has no characters usable in a kernel code name' %
+                        args.kernel_name)
 
     with TemporaryDirectory() as td:
         os.chmod(td, 0o755)
-        with open(os.path.join(td, 'kernel.json'), 'w') as f:
-            json.dump(kernel_json, f, indent=2)
+        with open(os.path.join(td, 'kernel.json'), 'wb') as f:
+            f.write(data)
         KernelSpecManager().install_kernel_spec(
             td, kernel_code_name, user=args.user, prefix=args.prefix)
 
@@ -456,6 +735,11 @@ def parse_args():
         dest='validate_only',
         help='(R2-T3) validate the Swift/LLDB installation without registering the kernel')
 
+    parser.add_argument(
+        '--verbose',
+        action='store_true',
+        help='print the generated kernel.json before registering it')
+
     args = parser.parse_args()
     
     if args.use_swiftly_toolchain:
@@ -14,9 +14,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import glob
 import json
 import os
+import platform
 import sys
 
 # Add LLDB Python path if PYTHONPATH is set (from kernel.json env)
@@ -69,17 +71,70 @@ class SuccessWithoutValue(ExecutionResultSuccess):
         return 'SuccessWithoutValue()'
 
 
+# One top-level element line of an LLDB collection description, e.g. "  [3] = 42".
+_ARRAY_ELEMENT_RE = re.compile(r'  \[(\d+)\] = (.*)$')
+
+_ARRAY_PREFIXES = ('Array<', 'ContiguousArray<', 'ArraySlice<')
+
+
+def _is_dictionary_sugar(type_name):
+    """Whether a bracketed type name like [K: V] is a dictionary.
+
+    Only a ':' outside any nested brackets or parentheses counts, so
+    [[Int]: String] is a dictionary while [[String: Int]] and
+    [(x: Int, y: Int)] are arrays.
+    """
+    depth = 0
+    for char in type_name[1:-1]:
+        if char in '[(':
+            depth += 1
+        elif char in '])':
+            depth -= 1
+        elif char == ':' and depth == 0:
+            return True
+    return False
+
+# Rich display HTML. The tables only carry class names and every HTML
+# output carries this short stylesheet with it, so each one renders the
+# same after a kernel restart, in a re-opened notebook or in nbconvert.
+_RICH_DISPLAY_CSS = """<style>
+div.swift-value { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; }
+div.swift-value div.caption { color: #6c757d; font-size: 12px; margin-bottom: 4px; }
+div.swift-value table { border-collapse: collapse; border: 1px solid #dee2e6; background: white; }
+div.swift-value thead tr { background: #f8f9fa; }
+div.swift-value th { padding: 8px 12px; border-bottom: 2px solid #dee2e6; text-align: left; }
+div.swift-value td { padding: 4px 12px; border-bottom: 1px solid #dee2e6; }
+div.swift-value td.i { color: #6c757d; }
+div.swift-value td.k { font-weight: 500; }
+div.swift-value td.t { color: #6c757d; font-size: 12px; }
+div.swift-empty { font-family: monospace; padding: 8px; background: #f8f9fa; border-radius: 4px; }
+</style>
+"""
+_TABLE_TPL = ('<div class="swift-value"><div class="caption">%s</div>'
+              '<table><thead><tr>%s</tr></thead><tbody>%s</tbody></table></div>')
+_EMPTY_TPL = '<div class="swift-empty">%s</div>'
+_INDEXED_ROW_TPL = '<tr><td class="i">%s</td><td>%s</td></tr>'
+_KEYED_ROW_TPL = '<tr><td class="k">%s</td><td>%s</td></tr>'
+_PROPERTY_ROW_TPL = '<tr><td class="k">%s</td><td class="t">%s</td><td>%s</td></tr>'
+_ARRAY_HEADER = '<th>Index</th><th>Value</th>'
+_DICTIONARY_HEADER = '<th>Key</th><th>Value</th>'
+_OBJECT_HEADER = '<th>Property</th><th>Type</th><th>Value</th>'
+
+
 class SuccessWithValue(ExecutionResultSuccess):
     """The code executed successfully, and produced a value."""
     def __init__(self, result):
         self.result = result # SBValue
+        self._description = None
 
     """A description of the value, e.g.
          (Int) $R0 = 64"""
     def value_description(self):
-        stream = lldb.SBStream()
-        self.result.GetDescription(stream)
-        return stream.GetData()
+        if self._description is None:
+            stream = lldb.SBStream()
+            self.result.GetDescription(stream)
+            self._description = stream.GetData()
+        return self._description
 
     def get_formatted_value(self):
         """Get a nicely formatted value for display in notebooks.
@@ -123,53 +178,53 @@ class SuccessWithValue(ExecutionResultSuccess):
         import html as html_module
 
         plain_text = self.get_formatted_value()
-        type_name = self.result.GetTypeName() or ""
+        kind = self.display_kind
 
-        # Check if this is Data that might be an image
-        if self._is_image_data(type_name):
+        html = None
+        if kind == 'image':
             image_data = self._get_image_data()
             if image_data:
                 # Return as a special marker for image display
                 return (plain_text, {'__image__': image_data})
-
-        # Check if this is an array type
-        if self._is_array_type(type_name):
+        elif kind == 'array':
             html = self._render_array_html()
-            if html:
-                return (plain_text, html)
-
-        # Check if this is a dictionary type
-        if self._is_dictionary_type(type_name):
+        elif kind == 'dictionary':
             html = self._render_dictionary_html()
-            if html:
-                return (plain_text, html)
 
-        # Check if this might be a struct/class with multiple fields
-        num_children = self.result.GetNumChildren()
-        if num_children > 0 and num_children <= 50:
-            # Could be a struct, class, tuple, or collection
+        # Could be a struct, class, tuple, or collection with a few fields
+        if html is None and 0 < self.num_children <= 50:
             html = self._render_object_html()
-            if html:
-                return (plain_text, html)
-
-        return (plain_text, None)
-
-    def _is_array_type(self, type_name):
-        """Check if the type is an array."""
-        return ('Array<' in type_name or
-                'ContiguousArray<' in type_name or
-                'ArraySlice<' in type_name or
-                type_name.startswith('[') and type_name.endswith(']'))
 
-    def _is_dictionary_type(self, type_name):
-        """Check if the type is a dictionary."""
-        return ('Dictionary<' in type_name or
-                'type_name'.startswith('[') and ':' in type_name)
-
-    def _is_image_data(self, type_name):
-        """Check if this might be image data."""
+        return (plain_text, html)
+
+    @functools.cached_property
+    def type_name(self):
+        return self.result.GetTypeName() or ""
+
+    @functools.cached_property
+    def num_children(self):
+        return self.result.GetNumChildren()
+
+    @functools.cached_property
+    def display_kind(self):
+        """Classify the value once as 'array', 'dictionary', 'image',
+        'object' or 'scalar'."""
+        type_name = self.type_name
+        bare_name = type_name[len('Swift.'):] if type_name.startswith('Swift.') else type_name
+        if bare_name.startswith('Dictionary<'):
+            return 'dictionary'
+        if bare_name.startswith(_ARRAY_PREFIXES):
+            return 'array'
+        if bare_name.startswith('[') and bare_name.endswith(']'):
+            if _is_dictionary_sugar(bare_name):
+                return 'dictionary'
+            return 'array'
         # Look for Foundation.Data or Swift Data type
-        return 'Data' in type_name or 'NSData' in type_name
+        if 'Data' in type_name:
+            return 'image'
+        if 0 < self.num_children <= 50:
+            return 'object'
+        return 'scalar'
 
     def _get_image_data(self):
         """Try to extract image data and return it as base64.
@@ -206,145 +261,110 @@ class SuccessWithValue(ExecutionResultSuccess):
         """Render an array as an HTML table."""
         import html as html_module
 
-        num_children = self.result.GetNumChildren()
+        num_children = self.num_children
         if num_children == 0:
-            return '<div style="font-family: monospace; padding: 8px; background: #f8f9fa; border-radius: 4px;">[]</div>'
+            return _EMPTY_TPL % '[]'
 
         if num_children > 100:
             # Too large, don't render as HTML
             return None
 
-        rows = []
-        for i in range(num_children):
+        rows = ''.join(
+            _INDEXED_ROW_TPL % (i, html_module.escape(str(value).strip('"')) if value else 'nil')
+            for i, value in enumerate(self._batch_fetch_children(num_children)))
+        return _TABLE_TPL % ('Array (%d elements)' % num_children,
+                             _ARRAY_HEADER, rows)
+
+    def _batch_fetch_children(self, n):
+        """Return the display values of the first n children.
+
+        LLDB has already formatted every element into the value description
+        (one `[i] = value` line each), so parse that rather than crossing
+        into LLDB once per child. Falls back to per-child SBValue traversal
+        when an element spans several lines (nested structs, collections).
+        """
+        lines = self.value_description().splitlines()[1:]
+        values = []
+        for line in lines:
+            match = _ARRAY_ELEMENT_RE.match(line)
+            if match is None:
+                continue
+            index, value = match.groups()
+            if int(index) != len(values) or value.endswith('{'):
+                break
+            values.append(value)
+        else:
+            if len(values) == n:
+                return values
+
+        values = []
+        for i in range(n):
             child = self.result.GetChildAtIndex(i)
-            value = child.GetValue() or child.GetSummary() or str(child)
-            # Clean up the value
-            if value:
-                value = html_module.escape(str(value).strip('"'))
-            else:
-                value = "nil"
-            rows.append(f'<tr><td style="padding: 4px 12px; border-bottom: 1px solid #dee2e6; color: #6c757d;">{i}</td><td style="padding: 4px 12px; border-bottom: 1px solid #dee2e6;">{value}</td></tr>')
-
-        html = f'''
-<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;">
-  <div style="color: #6c757d; font-size: 12px; margin-bottom: 4px;">Array ({num_children} elements)</div>
-  <table style="border-collapse: collapse; border: 1px solid #dee2e6; background: white;">
-    <thead>
-      <tr style="background: #f8f9fa;">
-        <th style="padding: 8px 12px; border-bottom: 2px solid #dee2e6; text-align: left;">Index</th>
-        <th style="padding: 8px 12px; border-bottom: 2px solid #dee2e6; text-align: left;">Value</th>
-      </tr>
-    </thead>
-    <tbody>
-      {''.join(rows)}
-    </tbody>
-  </table>
-</div>
-'''
-        return html
+            values.append(child.GetValue() or child.GetSummary() or str(child))
+        return values
 
     def _render_dictionary_html(self):
         """Render a dictionary as an HTML table."""
         import html as html_module
 
-        num_children = self.result.GetNumChildren()
+        num_children = self.num_children
         if num_children == 0:
-            return '<div style="font-family: monospace; padding: 8px; background: #f8f9fa; border-radius: 4px;">[:]</div>'
+            return _EMPTY_TPL % '[:]'
 
         if num_children > 100:
             return None
 
-        rows = []
-        for i in range(num_children):
-            child = self.result.GetChildAtIndex(i)
-            # Dictionary entries have key and value children
-            key_child = child.GetChildMemberWithName('key')
-            value_child = child.GetChildMemberWithName('value')
+        def entries():
+            for i in range(num_children):
+                child = self.result.GetChildAtIndex(i)
+                # Dictionary entries have key and value children
+                key_child = child.GetChildMemberWithName('key')
+                value_child = child.GetChildMemberWithName('value')
 
-            if key_child and value_child:
-                key = key_child.GetValue() or key_child.GetSummary() or str(key_child)
-                value = value_child.GetValue() or value_child.GetSummary() or str(value_child)
-            else:
-                # Fallback: use child directly
-                key = str(i)
-                value = child.GetValue() or child.GetSummary() or str(child)
-
-            key = html_module.escape(str(key).strip('"'))
-            value = html_module.escape(str(value).strip('"'))
-
-            rows.append(f'<tr><td style="padding: 4px 12px; border-bottom: 1px solid #dee2e6; font-weight: 500;">{key}</td><td style="padding: 4px 12px; border-bottom: 1px solid #dee2e6;">{value}</td></tr>')
-
-        html = f'''
-<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;">
-  <div style="color: #6c757d; font-size: 12px; margin-bottom: 4px;">Dictionary ({num_children} entries)</div>
-  <table style="border-collapse: collapse; border: 1px solid #dee2e6; background: white;">
-    <thead>
-      <tr style="background: #f8f9fa;">
-        <th style="padding: 8px 12px; border-bottom: 2px solid #dee2e6; text-align: left;">Key</th>
-        <th style="padding: 8px 12px; border-bottom: 2px solid #dee2e6; text-align: left;">Value</th>
-      </tr>
-    </thead>
-    <tbody>
-      {''.join(rows)}
-    </tbody>
-  </table>
-</div>
-'''
-        return html
+                if key_child and value_child:
+                    key = key_child.GetValue() or key_child.GetSummary() or str(key_child)
+                    value = value_child.GetValue() or value_child.GetSummary() or str(value_child)
+                else:
+                    # Fallback: use child directly
+                    key = str(i)
+                    value = child.GetValue() or child.GetSummary() or str(child)
+                yield key, value
+
+        rows = ''.join(
+            _KEYED_ROW_TPL % (html_module.escape(str(key).strip('"')),
+                              html_module.escape(str(value).strip('"')))
+            for key, value in entries())
+        return _TABLE_TPL % ('Dictionary (%d entries)' % num_children,
+                             _DICTIONARY_HEADER, rows)
 
     def _render_object_html(self):
         """Render a struct/class/tuple as an HTML table of properties."""
         import html as html_module
 
-        type_name = self.result.GetTypeName() or "Object"
-        num_children = self.result.GetNumChildren()
-
-        if num_children == 0:
-            return None
+        type_name = self.type_name or "Object"
+        num_children = self.num_children
 
-        # Skip if it looks like a simple wrapper
-        if num_children == 1:
+        # Skip empty values and values that look like a simple wrapper
+        if num_children <= 1:
             return None
 
-        rows = []
-        for i in range(num_children):
-            child = self.result.GetChildAtIndex(i)
-            name = child.GetName() or f"[{i}]"
-            child_type = child.GetTypeName() or ""
-            value = child.GetValue() or child.GetSummary() or ""
+        def properties():
+            for i in range(num_children):
+                child = self.result.GetChildAtIndex(i)
+                name = child.GetName() or f"[{i}]"
+                child_type = child.GetTypeName() or ""
+                value = child.GetValue() or child.GetSummary() or ""
+                yield name, child_type, value
 
-            # Clean up values
-            name = html_module.escape(str(name))
-            value = html_module.escape(str(value).strip('"')) if value else "<nil>"
-            child_type = html_module.escape(str(child_type))
-
-            rows.append(f'''<tr>
-              <td style="padding: 4px 12px; border-bottom: 1px solid #dee2e6; font-weight: 500;">{name}</td>
-              <td style="padding: 4px 12px; border-bottom: 1px solid #dee2e6; color: #6c757d; font-size: 12px;">{child_type}</td>
-              <td style="padding: 4px 12px; border-bottom: 1px solid #dee2e6;">{value}</td>
-            </tr>''')
+        rows = ''.join(
+            _PROPERTY_ROW_TPL % (html_module.escape(str(name)),
+                                 html_module.escape(str(child_type)),
+                                 html_module.escape(str(value).strip('"')) if value else "&lt;nil&gt;")
+            for name, child_type, value in properties())
 
         # Clean up type name for display
         display_type = html_module.escape(type_name.split('.')[-1])
-
-        html = f'''
-<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;">
-  <div style="color: #6c757d; font-size: 12px; margin-bottom: 4px;">{display_type}</div>
-  <table style="border-collapse: collapse; border: 1px solid #dee2e6; background: white;">
-    <thead>
-      <tr style="background: #f8f9fa;">
-        <th style="padding: 8px 12px; border-bottom: 2px solid #dee2e6; text-align: left;">Property</th>
-        <th style="padding: 8px 12px; border-bottom: 2px solid #dee2e6; text-align: left;">Type</th>
-        <th style="padding: 8px 12px; border-bottom: 2px solid #dee2e6; text-align: left;">Value</th>
-      </tr>
-    </thead>
-    <tbody>
-      {''.join(rows)}
-    </tbody>
-  </table>
-</div>
-'''
-        return html
+        return _TABLE_TPL % (display_type, _OBJECT_HEADER, rows)
 
     def __repr__(self):
         return 'SuccessWithValue(result=%s, description=%s)' % (
@@ -371,6 +391,11 @@ class PackageInstallException(Exception):
     pass
 
 
+# Name extraction for SwiftError.get_helpful_message
+_LET_CONSTANT_RE = re.compile(r"'(\w+)' is a 'let' constant")
+_IDENTIFIER_RE = re.compile(r"identifier '(\w+)'")
+
+
 class SwiftError(ExecutionResultError):
     """There was a compile or runtime error (R5-T3 enhanced).
 
@@ -383,16 +408,22 @@ class SwiftError(ExecutionResultError):
     def __init__(self, result):
         self.result = result # SBValue
         self._parsed_error = None
+        # Fetching the description crosses into LLDB, so it and the cleaned
+        # message derived from it are computed once
+        self._description = None
+        self._cleaned_message = None
 
     def description(self):
         """Get error description with improved formatting."""
-        error_desc = self.result.error.description
+        if self._description is None:
+            error_desc = self.result.error.description
 
-        # Decode if bytes (shouldn't happen in Python 3, but be safe)
-        if isinstance(error_desc, bytes):
-            error_desc = error_desc.decode('utf-8', errors='replace')
+            # Decode if bytes (shouldn't happen in Python 3, but be safe)
+            if isinstance(error_desc, bytes):
+                error_desc = error_desc.decode('utf-8', errors='replace')
 
-        return error_desc
+            self._description = error_desc
+        return self._description
 
     def get_error_type(self):
         """Extract error type from LLDB error.
@@ -400,12 +431,12 @@ class SwiftError(ExecutionResultError):
         Returns:
             str: Error type like 'error', 'warning', 'note', or 'unknown'
         """
-        desc = self.description()
-        if 'error:' in desc.lower():
+        desc = self.description().lower()
+        if 'error:' in desc:
             return 'error'
-        elif 'warning:' in desc.lower():
+        elif 'warning:' in desc:
             return 'warning'
-        elif 'note:' in desc.lower():
+        elif 'note:' in desc:
             return 'note'
         return 'unknown'
 
@@ -414,6 +445,8 @@ class SwiftError(ExecutionResultError):
 
         Removes LLDB-specific noise and formats the message better.
         """
+        if self._cleaned_message is not None:
+            return self._cleaned_message
         desc = self.description()
 
         # Remove common LLDB prefixes
@@ -426,7 +459,8 @@ class SwiftError(ExecutionResultError):
             if desc.startswith(prefix):
                 desc = desc[len(prefix):].lstrip()
 
-        return desc.strip()
+        self._cleaned_message = desc.strip()
+        return self._cleaned_message
 
     def get_helpful_message(self):
         """Get an enhanced error message with helpful suggestions.
@@ -437,13 +471,13 @@ class SwiftError(ExecutionResultError):
             str: Enhanced error message with suggestions and tips
         """
         original_error = self.get_cleaned_message()
+        lower_error = original_error.lower()
         suggestions = []
 
         # Pattern 1: Cannot assign to immutable variable
-        if "cannot assign to value:" in original_error.lower() and "is a 'let' constant" in original_error.lower():
+        if "cannot assign to value:" in lower_error and "is a 'let' constant" in lower_error:
             # Extract variable name if possible
-            import re
-            match = re.search(r"'(\w+)' is a 'let' constant", original_error)
+            match = _LET_CONSTANT_RE.search(original_error)
             if match:
                 var_name = match.group(1)
                 suggestions.append(f"💡 Tip: Change 'let {var_name}' to 'var {var_name}' to make it mutable")
@@ -452,9 +486,8 @@ class SwiftError(ExecutionResultError):
             suggestions.append("📖 Learn more: https://docs.swift.org/swift-book/LanguageGuide/TheBasics.html#ID310")
 
         # Pattern 2: Use of undeclared identifier
-        elif "use of unresolved identifier" in original_error.lower() or "use of undeclared identifier" in original_error.lower():
-            import re
-            match = re.search(r"identifier '(\w+)'", original_error)
+        elif "use of unresolved identifier" in lower_error or "use of undeclared identifier" in lower_error:
+            match = _IDENTIFIER_RE.search(original_error)
             if match:
                 var_name = match.group(1)
                 suggestions.append(f"💡 Tip: Make sure '{var_name}' is defined before using it")
@@ -464,19 +497,19 @@ class SwiftError(ExecutionResultError):
                 suggestions.append("💡 Tip: Make sure the identifier is defined before using it")
 
         # Pattern 3: Type mismatch
-        elif "cannot convert value of type" in original_error.lower():
+        elif "cannot convert value of type" in lower_error:
             suggestions.append("💡 Tip: Check the types of your values")
             suggestions.append("   • You may need to convert between types explicitly")
             suggestions.append("   • Example: String(intValue) or Int(stringValue)")
 
         # Pattern 4: Missing return statement
-        elif "missing return" in original_error.lower():
+        elif "missing return" in lower_error:
             suggestions.append("💡 Tip: All code paths in this function must return a value")
             suggestions.append("   • Add a return statement to every branch (if/else, switch cases)")
             suggestions.append("   • Or use 'return' with a default value at the end")
 
         # Pattern 5: Optional unwrapping
-        elif "value of optional type" in original_error.lower() and ("must be unwrapped" in original_error.lower() or "not unwrapped" in original_error.lower()):
+        elif "value of optional type" in lower_error and ("must be unwrapped" in lower_error or "not unwrapped" in lower_error):
             # Check if Swift compiler already provided suggestions (it often does)
             if "coalesce using '??'" not in original_error and "force-unwrap using '!'" not in original_error:
                 suggestions.append("💡 Tip: Optional values must be unwrapped before use")
@@ -487,31 +520,31 @@ class SwiftError(ExecutionResultError):
                 suggestions.append("📖 Learn more: https://docs.swift.org/swift-book/LanguageGuide/TheBasics.html#ID330")
 
         # Pattern 6: Nil coalescing
-        elif "unexpectedly found nil" in original_error.lower():
+        elif "unexpectedly found nil" in lower_error:
             suggestions.append("💡 Tip: An optional value was nil when it shouldn't be")
             suggestions.append("   • Use nil coalescing: value ?? defaultValue")
             suggestions.append("   • Or check for nil: if value != nil { ... }")
 
         # Pattern 7: Cannot call value of non-function type
-        elif "cannot call value of non-function type" in original_error.lower():
+        elif "cannot call value of non-function type" in lower_error:
             suggestions.append("💡 Tip: You're trying to call something that isn't a function")
             suggestions.append("   • Check that you're using () on functions, not properties")
             suggestions.append("   • Make sure the function name is spelled correctly")
 
         # Pattern 8: Consecutive statements on a line
-        elif "consecutive statements on a line must be separated by" in original_error.lower():
+        elif "consecutive statements on a line must be separated by" in lower_error:
             suggestions.append("💡 Tip: Put each statement on its own line or separate with semicolons")
             suggestions.append("   • Each statement should be on a new line")
             suggestions.append("   • Or use semicolons: let x = 1; let y = 2")
 
         # Pattern 9: Expected expression
-        elif "expected expression" in original_error.lower():
+        elif "expected expression" in lower_error:
             suggestions.append("💡 Tip: Swift expected a value or expression here")
             suggestions.append("   • Check for missing values after operators")
             suggestions.append("   • Make sure all parentheses and brackets are balanced")
 
         # Pattern 10: Initializer requires arguments
-        elif "missing argument" in original_error.lower() or "requires that" in original_error.lower():
+        elif "missing argument" in lower_error or "requires that" in lower_error:
             suggestions.append("💡 Tip: This initializer or function needs more arguments")
             suggestions.append("   • Check the function signature to see what parameters are required")
             suggestions.append("   • Provide all required arguments or use default values")
@@ -912,7 +945,6 @@ class SwiftIRDirectivesMixin:
                 lib_file = os.path.join(lib_path, lib_name)
                 if os.path.isfile(lib_file):
                     # Determine dlopen module based on platform
-                    import platform
                     dlopen_module = 'Darwin' if platform.system() == 'Darwin' else 'Glibc'
 
                     dlopen_code = f'''
@@ -1158,7 +1190,6 @@ class SwiftKernel(SwiftIRDirectivesMixin, Kernel):
             output = result.stdout
             # Parse version from output like "Swift version 6.3-dev"
             # or "Apple Swift version 5.9"
-            import re
             match = re.search(r'Swift version (\d+\.\d+)', output)
             if match:
                 return match.group(1)
@@ -1258,7 +1289,6 @@ class SwiftKernel(SwiftIRDirectivesMixin, Kernel):
                 self.lsp.stop()
                 
             if hasattr(self, 'tmp_dir') and os.path.exists(self.tmp_dir):
-                import shutil
                 shutil.rmtree(self.tmp_dir)
 
             self.log.info('Kernel shutdown complete')
@@ -1391,7 +1421,6 @@ class SwiftKernel(SwiftIRDirectivesMixin, Kernel):
 
             # Try to find sourcekit-lsp using 'which' command
             try:
-                import shutil
                 lsp_path = shutil.which('sourcekit-lsp')
             except (OSError, ImportError, AttributeError) as e:
                 self.log.debug(f'Error searching PATH for sourcekit-lsp: {e}')
@@ -1435,7 +1464,7 @@ class SwiftKernel(SwiftIRDirectivesMixin, Kernel):
             env['PATH'] = f"{toolchain_bin}:{env.get('PATH', '')}"
 
             # Get toolchain root (parent of usr/bin)
-            toolchain_root = os.environ.get('SWIFT_TOOLCHAIN_ROOT')
+            toolchain_root = env.get('SWIFT_TOOLCHAIN_ROOT')
             if not toolchain_root:
                 # Try to infer from LSP path (e.g., /path/to/toolchain/usr/bin/sourcekit-lsp)
                 if 'usr/bin' in lsp_path:
@@ -1531,7 +1560,6 @@ class SwiftKernel(SwiftIRDirectivesMixin, Kernel):
 
         # Pre-load libswiftCore.so to avoid ImportError when LD_LIBRARY_PATH is not set
         import ctypes
-        import glob
 
         # Try to find libswiftCore.so relative to PYTHONPATH or in standard locations
         # We assume PYTHONPATH points to .../usr/local/lib/python.../dist-packages
@@ -1629,7 +1657,6 @@ class SwiftKernel(SwiftIRDirectivesMixin, Kernel):
         self.log.info(f'repl_swift path: {repl_swift}')
 
         # Explicitly specify architecture for Apple Silicon compatibility
-        import platform
         arch = platform.machine()  # Returns 'arm64' on Apple Silicon, 'x86_64' on Intel
         self.log.info(f'Architecture: {arch}')
 
@@ -1652,10 +1679,10 @@ class SwiftKernel(SwiftIRDirectivesMixin, Kernel):
             'PYTHONPATH',
             'REPL_SWIFT_PATH'
         ]
-        for key in os.environ:
+        for key, value in os.environ.items():
             if key in env_var_blacklist:
                 continue
-            repl_env.append('%s=%s' % (key, os.environ[key]))
+            repl_env.append('%s=%s' % (key, value))
 
         # Turn off "disable ASLR" because it uses the "personality" syscall in
         # a way that is forbidden by the default Docker security policy.
@@ -1885,8 +1912,6 @@ class SwiftKernel(SwiftIRDirectivesMixin, Kernel):
 
     def _handle_timeit_magic(self, code):
         """Handle %timeit magic command - time code execution."""
-        import time
-        import re
 
         # Extract the code to time
         match = re.match(r'^\s*%timeit\s+(.+)$', code, re.DOTALL)
@@ -2001,8 +2026,6 @@ Kernel Control:
 
     def _handle_env_magic(self, code):
         """Handle %env magic - show or set environment variables."""
-        import os
-        import re
 
         parts = code.strip().split(None, 1)
 
@@ -2057,8 +2080,6 @@ Kernel Control:
 
     def _handle_swift_version_magic(self):
         """Handle %swift-version - show Swift toolchain information."""
-        import subprocess
-        import shutil
 
         output = ["Swift Toolchain Information\n", "━" * 60 + "\n\n"]
 
@@ -2088,7 +2109,6 @@ Kernel Control:
                     capture_output=True, text=True, timeout=10
                 )
                 if result.returncode == 0:
-                    import json
                     try:
                         info = json.loads(result.stdout)
                         target = info.get('target', {})
@@ -2114,7 +2134,6 @@ Kernel Control:
 
         # Show kernel environment
         output.append("\n🔌 Kernel Environment:\n")
-        import os
         swift_build = os.environ.get('SWIFT_BUILD_PATH', 'not set')
         swift_package = os.environ.get('SWIFT_PACKAGE_PATH', 'not set')
         output.append(f"   SWIFT_BUILD_PATH: {swift_build}\n")
@@ -2129,8 +2148,6 @@ Kernel Control:
 
     def _handle_load_magic(self, code):
         """Handle %load FILE - load and execute a Swift file."""
-        import re
-        import os
 
         match = re.match(r'^\s*%load\s+(.+)$', code)
         if not match:
@@ -2181,8 +2198,6 @@ Kernel Control:
 
     def _handle_save_magic(self, code):
         """Handle %save FILE - save execution history to a file."""
-        import re
-        import os
 
         match = re.match(r'^\s*%save\s+(.+)$', code)
         if not match:
@@ -2233,7 +2248,6 @@ Kernel Control:
 
     def _handle_history_magic(self, code):
         """Handle %history - show execution history."""
-        import re
 
         # Parse options
         match = re.search(r'-n\s*(\d+)', code)
@@ -2646,7 +2660,6 @@ Kernel Control:
         if swiftpm_env_vars:
             swiftpm_env.update(swiftpm_env_vars)
 
-        import time
         start_time = time.time()
 
         # Progress: Step 3
@@ -2819,7 +2832,6 @@ Kernel Control:
         self._init_swift()
 
         # Use Darwin on macOS, Glibc on Linux
-        import platform
         if platform.system() == 'Darwin':
             dlopen_module = 'Darwin'
         else:
@@ -3177,8 +3189,8 @@ Kernel Control:
                             mime_type = image_info.get('mime_type', 'image/png')
                             data[mime_type] = image_info['data']
                     elif isinstance(rich_data, str):
-                        # HTML content
-                        data['text/html'] = rich_data
+                        # HTML content, with the stylesheet it relies on
+                        data['text/html'] = _RICH_DISPLAY_CSS + rich_data
 
                 self.send_response(self.iopub_socket, 'execute_result', {
                     'execution_count': self.execution_count,
@@ -3335,7 +3347,6 @@ Kernel Control:
                             matches.append(item)
 
                 # Calculate the start position of the identifier being completed
-                import re
                 prefix_match = re.search(r'[\w\d_\.]+$', code[:cursor_pos])
                 if prefix_match:
                     prefix = prefix_match.group(0)
@@ -3412,7 +3423,6 @@ Kernel Control:
             })
 
             # Give LSP a moment to process the document update
-            import time
             time.sleep(0.1)
 
             # Calculate absolute cursor position in the combined document
@@ -0,0 +1,212 @@
+"""LSPClient tests against a fake language server.
+
+These tests validate:
+- Content-Length framing across split and coalesced pipe reads
+- Request/response matching by id
+- Cleanup of timed-out requests
+- Coalescing of publishDiagnostics bursts
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from lsp_client import LSPClient
+
+
+# A minimal JSON-RPC server on stdin/stdout. The request method selects how
+# it answers, so each test can exercise one framing or dispatch path.
+FAKE_SERVER = r'''
+import json
+import sys
+import time
+
+stdin = sys.stdin.buffer
+stdout = sys.stdout.buffer
+
+
+def frame(message, extra_header=b""):
+    body = json.dumps(message).encode("utf-8")
+    return b"Content-Length: %d\r\n%s\r\n" % (len(body), extra_header) + body
+
+
+def send(data):
+    stdout.write(data)
+    stdout.flush()
+
+
+def read_message():
+    length = None
+    while True:
+        line = stdin.readline()
+        if not line:
+            return None
+        if line in (b"\r\n", b"\n"):
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    return json.loads(stdin.read(length))
+
+
+held = []
+while True:
+    message = read_message()
+    if message is None:
+        break
+    method = message.get("method")
+    params = message.get("params")
+    if "id" not in message:
+        continue
+    response = {"jsonrpc": "2.0", "id": message["id"], "result": params}
+    if method == "echo":
+        send(frame(response))
+    elif method == "split":
+        # One byte per write, with an extra header, so the client sees the
+        # header and body arrive in many small reads
+        data = frame(response, b"Content-Type: application/vscode-jsonrpc; charset=utf-8\r\n")
+        for i in range(len(data)):
+            send(data[i:i + 1])
+            time.sleep(0.001)
+    elif method == "hold":
+        # Answer once params["count"] requests are held, in reverse order
+        # and in a single write
+        held.append(response)
+        if len(held) == params["count"]:
+            send(b"".join(frame(r) for r in reversed(held)))
+            held = []
+    elif method == "diagnostics":
+        burst = b"".join(
+            frame({"jsonrpc": "2.0",
+                   "method": "textDocument/publishDiagnostics",
+                   "params": p})
+            for p in params["publish"])
+        send(burst + frame(response))
+    elif method == "error":
+        send(frame({"jsonrpc": "2.0", "id": message["id"],
+                    "error": {"code": -32601, "message": "nope"}}))
+    # "hang" and anything else get no answer
+'''
+
+
+@pytest.fixture
+def client():
+    """Start an LSPClient connected to the fake server."""
+    lsp = LSPClient(sys.executable, ['-c', FAKE_SERVER])
+    lsp.start()
+    yield lsp
+    lsp.stop()
+
+
+class TestFraming:
+    """Test Content-Length framing of server messages."""
+
+    def test_round_trip(self, client):
+        """Test a request gets its result back."""
+        assert client.send_request('echo', {'x': 1}, timeout=5) == {'x': 1}
+
+    def test_non_ascii_body(self, client):
+        """Test Content-Length counts bytes, not characters."""
+        params = {'text': 'café ☃ \U0001F600'}
+        assert client.send_request('echo', params, timeout=5) == params
+
+    def test_message_split_across_reads(self, client):
+        """Test a frame delivered one byte at a time, with Content-Type."""
+        params = {'text': 'x' * 100}
+        assert client.send_request('split', params, timeout=10) == params
+
+    def test_large_message(self, client):
+        """Test a body larger than one pipe read."""
+        params = {'text': 'y' * 300000}
+        assert client.send_request('echo', params, timeout=10) == params
+
+    def test_error_response(self, client):
+        """Test a JSON-RPC error is raised to the caller."""
+        with pytest.raises(Exception, match='LSP Error'):
+            client.send_request('error', {}, timeout=5)
+
+
+class TestRequestMatching:
+    """Test responses are routed to the request with the same id."""
+
+    def test_out_of_order_responses(self, client):
+        """Test responses arriving in reverse order in one read."""
+        count = 8
+        results = [None] * count
+
+        def request(i):
+            results[i] = client.send_request('hold', {'count': count, 'i': i}, timeout=10)
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [{'count': count, 'i': i} for i in range(count)]
+        assert client.pending_requests == {}
+
+
+class TestTimeout:
+    """Test timed-out requests are cleaned up."""
+
+    def test_timeout_removes_pending_request(self, client):
+        """Test a request with no answer raises and leaves nothing behind."""
+        with pytest.raises(TimeoutError):
+            client.send_request('hang', {}, timeout=0.2)
+        assert client.pending_requests == {}
+
+    def test_client_usable_after_timeout(self, client):
+        """Test later requests still match after one timed out."""
+        with pytest.raises(TimeoutError):
+            client.send_request('hang', {}, timeout=0.2)
+        assert client.send_request('echo', {'after': True}, timeout=5) == {'after': True}
+
+
+class TestDiagnostics:
+    """Test publishDiagnostics coalescing."""
+
+    def test_burst_coalesced_by_uri(self, client):
+        """Test only the latest diagnostics per URI reach the callback."""
+        received = []
+        done = threading.Event()
+
+        def callback(params):
+            received.append(params)
+            if len(received) == 2:
+                done.set()
+
+        client.set_diagnostics_callback(callback)
+        publish = [
+            {'uri': 'file:///a.swift', 'version': 1, 'diagnostics': []},
+            {'uri': 'file:///b.swift', 'version': 1, 'diagnostics': []},
+            {'uri': 'file:///a.swift', 'version': 2, 'diagnostics': []},
+            {'uri': 'file:///a.swift', 'version': 3, 'diagnostics': [{'message': 'x'}]},
+        ]
+        client.send_request('diagnostics', {'publish': publish}, timeout=5)
+
+        assert done.wait(5)
+        # Give a stray third dispatch the chance to show up
+        time.sleep(0.1)
+        by_uri = {params['uri']: params for params in received}
+        assert len(received) == 2
+        assert by_uri['file:///a.swift']['version'] == 3
+        assert by_uri['file:///b.swift']['version'] == 1
+
+
+class TestStop:
+    """Test shutting the client down."""
+
+    def test_stop_closes_wake_pipe_and_reaps_server(self):
+        """Test stop() joins the reader, closes its pipe and reaps the server."""
+        lsp = LSPClient(sys.executable, ['-c', FAKE_SERVER])
+        lsp.start()
+        lsp.stop()
+        assert not lsp.reader_thread.is_alive()
+        assert lsp._wake_r is None and lsp._wake_w is None
+        assert lsp.process.returncode is not None
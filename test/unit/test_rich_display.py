@@ -0,0 +1,130 @@
+"""SuccessWithValue rich display tests with a fake LLDB value.
+
+These tests validate:
+- Type classification for arrays, dictionaries and other values
+- Reading array elements from LLDB's value description
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+swift_kernel = pytest.importorskip('swift_kernel')
+
+
+class FakeValue:
+    """The subset of lldb.SBValue that SuccessWithValue reads."""
+
+    def __init__(self, type_name, children=(), value=None, name=None):
+        self.type_name = type_name
+        self.children = list(children)
+        self.value = value
+        self.name = name
+        self.child_calls = 0
+
+    def GetTypeName(self):
+        return self.type_name
+
+    def GetNumChildren(self):
+        return len(self.children)
+
+    def GetChildAtIndex(self, index):
+        self.child_calls += 1
+        return self.children[index]
+
+    def GetValue(self):
+        return self.value
+
+    def GetSummary(self):
+        return None
+
+    def GetName(self):
+        return self.name
+
+
+def make_value(type_name, num_children=0):
+    children = [FakeValue('Int', value=str(i)) for i in range(num_children)]
+    return swift_kernel.SuccessWithValue(FakeValue(type_name, children))
+
+
+class TestDisplayKind:
+    """Test SuccessWithValue.display_kind."""
+
+    @pytest.mark.parametrize('type_name', [
+        '[Int]',
+        'Swift.Array<Swift.Int>',
+        'ContiguousArray<Int>',
+        'ArraySlice<Int>',
+        '[[String: Int]]',
+        '[(x: Int, y: Int)]',
+        '[[(a: Int, b: String)]]',
+    ])
+    def test_array(self, type_name):
+        """Test array types, including arrays of dictionaries and labelled tuples."""
+        assert make_value(type_name, 2).display_kind == 'array'
+
+    @pytest.mark.parametrize('type_name', [
+        '[String : Int]',
+        '[String: [Int]]',
+        '[[Int]: String]',
+        '[(Int, Int): String]',
+        'Swift.Dictionary<Swift.String, Swift.Array<Swift.Int>>',
+    ])
+    def test_dictionary(self, type_name):
+        """Test dictionary types, including ones keyed by arrays or tuples."""
+        assert make_value(type_name, 2).display_kind == 'dictionary'
+
+    def test_image(self):
+        """Test Data is offered as a possible image."""
+        assert make_value('Foundation.Data', 2).display_kind == 'image'
+
+    def test_object_and_scalar(self):
+        """Test structs with a few fields and plain values."""
+        assert make_value('main.Point', 2).display_kind == 'object'
+        assert make_value('Swift.Int').display_kind == 'scalar'
+
+
+class TestBatchFetchChildren:
+    """Test reading array elements from the value description."""
+
+    def test_flat_elements(self, monkeypatch):
+        """Test one-line elements come from the description, not SBValues."""
+        value = make_value('[String]', 3)
+        monkeypatch.setattr(value, 'value_description', lambda: (
+            '([String]) $R0 = 3 values {\n'
+            '  [0] = "a"\n'
+            '  [1] = "b = c"\n'
+            '  [2] = ""\n'
+            '}'))
+        assert value._batch_fetch_children(3) == ['"a"', '"b = c"', '""']
+        assert value.result.child_calls == 0
+
+    def test_nested_elements_fall_back(self, monkeypatch):
+        """Test multi-line elements fall back to per-child traversal."""
+        value = make_value('[Point]', 2)
+        monkeypatch.setattr(value, 'value_description', lambda: (
+            '([Point]) $R0 = 2 values {\n'
+            '  [0] = {\n'
+            '    x = 0\n'
+            '  }\n'
+            '  [1] = {\n'
+            '    x = 1\n'
+            '  }\n'
+            '}'))
+        assert value._batch_fetch_children(2) == ['0', '1']
+        assert value.result.child_calls == 2
+
+    def test_count_mismatch_falls_back(self, monkeypatch):
+        """Test a description listing fewer elements than the value has."""
+        value = make_value('[Int]', 3)
+        monkeypatch.setattr(value, 'value_description', lambda: (
+            '([Int]) $R0 = 3 values {\n'
+            '  [0] = 0\n'
+            '  [1] = 1\n'
+            '  ...\n'
+            '}'))
+        assert value._batch_fetch_children(3) == ['0', '1', '2']
+        assert value.result.child_calls == 3